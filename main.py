@@ -1,12 +1,49 @@
 import os
+import sys
+import mmap
+import pathlib
+import stat
+import tempfile
+import asyncio
 import anthropic
-from typing import List, Dict, Any, Optional
+import httpx
+from typing import List, Dict, Any, Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import re
+import selectors
+import shlex
 import subprocess
+import threading
+import time
+import uuid
 from rdkit import Chem
 from rdkit.Chem import AllChem
 from urllib.request import urlopen
 from urllib.parse import quote
 
+# Model used for both chat turns and answer evaluation
+MODEL_HAIKU = "claude-3-5-haiku-latest"
+
+# Shared connection pool so every request (and every chat session) reuses the
+# same keep-alive TCP+TLS connection; HTTP/2 multiplexes tool-result follow-ups.
+HTTP_CLIENT = anthropic.DefaultAsyncHttpxClient(
+    http2=True,
+    limits=httpx.Limits(max_keepalive_connections=4, max_connections=8, keepalive_expiry=300.0),
+    # Fail fast on unreachable networks; the read timeout applies between streamed chunks
+    timeout=httpx.Timeout(60.0, connect=5.0),
+)
+
+# Bound once so hot paths skip the print() machinery
+_out = sys.stdout.write
+
+# Streamed tokens are written out once this many characters or seconds have accumulated
+STREAM_FLUSH_CHARS = 64
+STREAM_FLUSH_SECONDS = 0.016
+
+class ToolError(Exception):
+    """Raised by tools for failures that should be reported to Claude as an error tool_result"""
+
 class Colors:
     """ANSI color codes for terminal output"""
     USER = "\033[96m"      # Bright cyan
@@ -16,6 +53,44 @@ class Colors:
     ERROR = "\033[91m"     # Bright red
     RESET = "\033[0m"
 
+# Precomputed once; streamed output writes raw bytes to the stdout file descriptor
+STDOUT_FD = 1
+CLAUDE_PREFIX = f"{Colors.CLAUDE}Claude:{Colors.RESET} ".encode()
+
+def _write_stdout(data: bytes) -> None:
+    """Write bytes straight to stdout, bypassing TextIOWrapper encoding and buffering"""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(STDOUT_FD, view):]
+
+async def _ainput(prompt: str) -> str:
+    """Read a line from stdin without tying up an executor thread"""
+    # input() cannot be interrupted, and asyncio.run waits for executor threads on shutdown,
+    # so read on a daemon thread that Ctrl-C can abandon
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def settle(result: Optional[str], error: Optional[BaseException]) -> None:
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def reader() -> None:
+        try:
+            result, error = input(prompt), None
+        except Exception as e:
+            result, error = None, e
+        try:
+            loop.call_soon_threadsafe(settle, result, error)
+        except RuntimeError:
+            pass  # The loop already closed
+
+    threading.Thread(target=reader, daemon=True).start()
+    return await future
+
 class FileReaderTool:
     """Tool for reading files from the filesystem"""
     
@@ -34,37 +109,91 @@ class FileReaderTool:
             "required": ["file_path"]
         }
     }
+
+    # Method _dispatch calls with the tool input, and the status line shown while it runs
+    HANDLER = "read_file"
+    STATUS = "Reading file"
+    # Read-only tools have no side effects, so they may start before the response is final
+    READ_ONLY = True
+    # Coroutine method that asks the user to approve a call before it runs, if any
+    CONFIRM = None
     
-    @staticmethod
-    def read_file(file_path: str) -> str:
+    # Files larger than MAX_BYTES are returned as their first HEAD_BYTES and last TAIL_BYTES
+    MAX_BYTES = 256 * 1024
+    HEAD_BYTES = 192 * 1024
+    TAIL_BYTES = 32 * 1024
+    
+    # Upper bound on the memory held by cached file contents, measured with sys.getsizeof
+    # since a str stores 1, 2 or 4 bytes per character depending on its widest character
+    CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+    def __init__(self):
+        # LRU cache keyed by (path, mtime, size), so edited files are never served stale
+        self._cache: "OrderedDict[tuple, str]" = OrderedDict()
+        self._cache_bytes = 0
+        self._cache_lock = threading.Lock()
+    
+    def read_file(self, file_path: str) -> str:
         """Read file contents safely with error handling"""
         try:
-            # Check if file exists
-            if not os.path.exists(file_path):
-                return f"Error: File '{file_path}' not found."
+            # A single stat answers existence, file type, size and mtime
+            try:
+                st = os.stat(file_path)
+            except FileNotFoundError:
+                raise ToolError(f"Error: File '{file_path}' not found.") from None
             
             # Check if it's actually a file (not a directory)
-            if not os.path.isfile(file_path):
-                return f"Error: '{file_path}' is not a file."
+            if not stat.S_ISREG(st.st_mode):
+                raise ToolError(f"Error: '{file_path}' is not a file.")
             
-            # Read the file
-            with open(file_path, 'r', encoding='utf-8') as file:
-                content = file.read()
-
+            key = (os.path.abspath(file_path), st.st_mtime_ns, st.st_size)
+            with self._cache_lock:
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    return self._cache[key]
+
+            content = self._read_contents(file_path, st.st_size)
+
+            with self._cache_lock:
+                size = sys.getsizeof(content)
+                if key not in self._cache and size <= self.CACHE_MAX_BYTES:
+                    self._cache[key] = content
+                    self._cache_bytes += size
+                    while self._cache_bytes > self.CACHE_MAX_BYTES:
+                        _, evicted = self._cache.popitem(last=False)
+                        self._cache_bytes -= sys.getsizeof(evicted)
             return content
         
-        except PermissionError:
-            return f"Error: Permission denied reading '{file_path}'."
-        except UnicodeDecodeError:
-            # Try reading as binary if text fails
-            try:
-                with open(file_path, 'rb') as file:
-                    content = file.read()
-                return f"Binary file detected. File size: {len(content)} bytes. Cannot display content as text."
-            except Exception as e:
-                return f"Error reading file: {str(e)}"
+        except ToolError:
+            raise
+        except PermissionError as e:
+            raise ToolError(f"Error: Permission denied reading '{file_path}'.") from e
         except Exception as e:
-            return f"Error reading file: {str(e)}"
+            raise ToolError(f"Error reading file: {str(e)}") from e
+
+    def _read_contents(self, file_path: str, size: int) -> str:
+        """Read and decode a regular file of the given size"""
+        if size == 0:
+            return ""
+
+        # One unbuffered pread per region: no BufferedReader/TextIOWrapper copies, no seek
+        fd = os.open(file_path, os.O_RDONLY)
+        try:
+            if size > self.MAX_BYTES:
+                # Bound memory and prompt size for large files
+                head = os.pread(fd, self.HEAD_BYTES, 0)
+                tail = os.pread(fd, self.TAIL_BYTES, size - self.TAIL_BYTES)
+                omitted = size - len(head) - len(tail)
+                data = head + f"\n...[truncated {omitted} bytes]...\n".encode() + tail
+            else:
+                head = data = os.pread(fd, size, 0)
+        finally:
+            os.close(fd)
+
+        # NUL bytes mean binary; anything else is decoded best-effort
+        if b"\0" in head:
+            return f"Binary file detected. File size: {size} bytes. Cannot display content as text."
+        return data.decode('utf-8', 'replace')
 
 class ListFilesTool:
     """Tool for listing files in a directory. If the path is not specified, it lists the current directory."""
@@ -82,38 +211,63 @@ class ListFilesTool:
             "required": []
         }
     }
+
+    HANDLER = "list_files"
+    STATUS = "Listing files in"
+    READ_ONLY = True
+    CONFIRM = None
     
+    # Directories with more entries than this stat their files on a thread pool
+    PARALLEL_STAT_THRESHOLD = 64
+    STAT_WORKERS = 32
+
+    def __init__(self, cwd: pathlib.Path):
+        self.cwd = cwd
+
     @staticmethod
-    def list_files(directory_path: str = ".") -> str:
+    def _describe_entry(entry: os.DirEntry) -> str:
+        """Describe a directory entry. Type checks come from the dirent itself, and only
+        regular files are stat'ed (symlink targets never are)."""
+        if entry.is_file(follow_symlinks=False):
+            return f"{entry.name} (Size: {entry.stat(follow_symlinks=False).st_size} bytes)"
+        if entry.is_symlink():
+            return f"{entry.name} (Symlink)"
+        return f"{entry.name} (Directory)"
+
+    def list_files(self, directory_path: str = ".") -> str:
         """List files in the specified directory"""
         try:
-            # Normalize the path
-            directory_path = os.path.abspath(directory_path)
+            # Normalize the path, resolving symlinks and '..' components
+            resolved = pathlib.Path(directory_path).resolve()
+            directory_path = str(resolved)
 
             # Allow listing only directories from current working directory
-            if not directory_path.startswith(os.getcwd()):
-                return f"Error: Access to '{directory_path}' is not allowed. Only current directory and subdirectories are accessible."
+            if not resolved.is_relative_to(self.cwd):
+                raise ToolError(f"Error: Access to '{directory_path}' is not allowed. Only current directory and subdirectories are accessible.")
             
             # Check if the path is a directory
             if not os.path.isdir(directory_path):
-                return f"Error: '{directory_path}' is not a valid directory."
+                raise ToolError(f"Error: '{directory_path}' is not a valid directory.")
             
-            # List files
-            files = os.listdir(directory_path)
-            for f in files:
-                full_path = os.path.join(directory_path, f)
-                if os.path.isfile(full_path):
-                    size = os.path.getsize(full_path)
-                    files[files.index(f)] = f"{f} (Size: {size} bytes)"
-                else:
-                    files[files.index(f)] = f"{f} (Directory)"
+            # List files in a single scandir pass
+            with os.scandir(directory_path) as it:
+                entries = list(it)
+
+            # On network filesystems every stat is a round-trip, so overlap them for large directories
+            if len(entries) > self.PARALLEL_STAT_THRESHOLD:
+                with ThreadPoolExecutor(max_workers=self.STAT_WORKERS) as pool:
+                    files = list(pool.map(self._describe_entry, entries))
+            else:
+                files = [self._describe_entry(entry) for entry in entries]
 
             return str(files)
         
-        except PermissionError:
-            return f"Error: Permission denied accessing '{directory_path}'."
+        except ToolError:
+            raise
+        except PermissionError as e:
+            raise ToolError(f"Error: Permission denied accessing '{directory_path}'.") from e
         except Exception as e:
-            return f"Error listing files: {str(e)}"
+            raise ToolError(f"Error listing files: {str(e)}") from e
 
 class EditFileTool:
     """Tool for editing files in the current directory"""
@@ -135,48 +289,157 @@ class EditFileTool:
                 "new_str": {
                     "type": "string",
                     "description": "The string to replace with"
+                },
+                "replace_all": {
+                    "type": "boolean",
+                    "description": "Replace every occurrence of old_str. Defaults to false, in which case old_str must occur exactly once."
                 }
             },
             "required": ["file_path", "old_str", "new_str"]
         }
     }
 
+    HANDLER = "edit_file"
+    STATUS = "Editing file"
+    READ_ONLY = False
+    CONFIRM = None
+
+    # Files of at least STREAM_THRESHOLD bytes are rewritten in STREAM_CHUNK-sized blocks
+    STREAM_THRESHOLD = 1 << 20
+    STREAM_CHUNK = 1 << 20
+
+    @staticmethod
+    def _stream_replace(src, dst, old: bytes, new: bytes, chunk_size: int) -> int:
+        """Copy src to dst replacing old with new chunk by chunk. Returns the number of replacements."""
+        count = 0
+        # Hold back enough bytes to catch matches that straddle a chunk boundary
+        keep = len(old) - 1
+        carry = b""
+        for chunk in iter(lambda: src.read(chunk_size), b""):
+            buf = carry + chunk
+            pos = 0
+            while (idx := buf.find(old, pos)) != -1:
+                dst.write(buf[pos:idx])
+                dst.write(new)
+                pos = idx + len(old)
+                count += 1
+            safe = max(pos, len(buf) - keep)
+            dst.write(buf[pos:safe])
+            carry = buf[safe:]
+        dst.write(carry)
+        return count
+
+    def __init__(self, cwd: pathlib.Path):
+        self.cwd = cwd
+
     @staticmethod
-    def edit_file(file_path: str, old_str: str, new_str: str) -> str:
+    def _patch_in_place(file_path: str, old: bytes, new: bytes, replace_all: bool) -> int:
+        """Overwrite equal-length matches directly in the mapped file. Returns the number of matches."""
+        with open(file_path, 'r+b') as file, mmap.mmap(file.fileno(), 0) as mm:
+            # Locate every match first so a rejected edit leaves the file untouched
+            positions = []
+            idx = mm.find(old)
+            while idx != -1:
+                positions.append(idx)
+                idx = mm.find(old, idx + len(old))
+            if len(positions) == 1 or (positions and replace_all):
+                for idx in positions:
+                    mm[idx:idx + len(new)] = new
+                mm.flush()
+        return len(positions)
+
+    def _rewrite(self, file_path: str, st: os.stat_result, old_str: str, new_str: str, replace_all: bool) -> int:
+        """Rewrite the file with the replacement applied. Returns the number of matches."""
+        old_bytes = old_str.encode('utf-8')
+        data = None
+        if st.st_size < self.STREAM_THRESHOLD:
+            # newline='' keeps line endings as-is, so matching is byte-exact like the mmap and streaming paths
+            with open(file_path, 'r', encoding='utf-8', newline='') as file:
+                content = file.read()
+            count = content.count(old_str)
+            # Nothing gets written when the edit is a no-op or would be rejected
+            if count == 0 or (count > 1 and not replace_all):
+                return count
+            data = (content.replace(old_str, new_str) if replace_all else content.replace(old_str, new_str, 1)).encode('utf-8')
+        else:
+            # Scan the mapped file for a match before streaming a full copy of it
+            with open(file_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if mm.find(old_bytes) == -1:
+                    return 0
+
+        # Write to a temporary sibling and swap it in atomically so a crash never leaves a half-written file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(file_path), prefix=".edit-")
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                if data is not None:
+                    tmp.write(data)
+                else:
+                    with open(file_path, 'rb') as file:
+                        count = self._stream_replace(file, tmp, old_bytes, new_str.encode('utf-8'), self.STREAM_CHUNK)
+
+            if count != 1 and not replace_all:
+                os.unlink(tmp_path)
+                return count
+
+            # Keep the original permission bits, reusing the stat result already taken
+            os.chmod(tmp_path, stat.S_IMODE(st.st_mode))
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return count
+
+    def edit_file(self, file_path: str, old_str: str, new_str: str, replace_all: bool = False) -> str:
         """Edit a file by replacing old_str with new_str"""
         try:
-            # Normalize the path
-            file_path = os.path.abspath(file_path)
+            # Normalize the path, resolving symlinks and '..' components
+            resolved = pathlib.Path(file_path).resolve()
+            file_path = str(resolved)
 
             # Allow editing only files in the current working directory
-            if not file_path.startswith(os.getcwd()):
-                return f"Error: Access to '{file_path}' is not allowed. Only files in the current directory are editable."
+            if not resolved.is_relative_to(self.cwd):
+                raise ToolError(f"Error: Access to '{file_path}' is not allowed. Only files in the current directory are editable.")
 
-            # Check if file exists
-            if not os.path.exists(file_path):
+            # A single stat answers existence, file type, size and mode
+            try:
+                st = os.stat(file_path)
+            except FileNotFoundError:
+                # Only an empty old_str can apply to a new file; anything else must not leave one behind
+                if old_str:
+                    raise ToolError(f"Error: File '{file_path}' not found.") from None
                 file = open(file_path, 'w')  # Create the file if it doesn't exist
                 file.close()
+                st = os.stat(file_path)
 
             # Check if it's actually a file (not a directory)
-            if not os.path.isfile(file_path):
-                return f"Error: '{file_path}' is not a file."
-            
-            # Read the file
-            with open(file_path, 'r', encoding='utf-8') as file:
-                content = file.read()
+            if not stat.S_ISREG(st.st_mode):
+                raise ToolError(f"Error: '{file_path}' is not a file.")
             
-            # Replace the string
-            new_content = content.replace(old_str, new_str)
-            
-            # Write the changes back to the file
-            with open(file_path, 'w', encoding='utf-8') as file:
-                file.write(new_content)
+            size = st.st_size
+            if size >= self.STREAM_THRESHOLD and not old_str:
+                raise ToolError(f"Error: old_str must not be empty when editing large files like '{file_path}'.")
+
+            old_bytes = old_str.encode('utf-8')
+            new_bytes = new_str.encode('utf-8')
+            if size and old_bytes and len(old_bytes) == len(new_bytes):
+                count = self._patch_in_place(file_path, old_bytes, new_bytes, replace_all)
+            else:
+                count = self._rewrite(file_path, st, old_str, new_str, replace_all)
+
+            if count == 0:
+                raise ToolError(f"Error: No occurrences of old_str found in '{file_path}'.")
+            if count != 1 and not replace_all:
+                raise ToolError(f"Error: Found {count} occurrences of old_str in '{file_path}'. "
+                                "Include more context to match exactly one, or set replace_all.")
             return f"File '{file_path}' edited successfully."
         
-        except PermissionError:
-            return f"Error: Permission denied editing '{file_path}'."
+        except ToolError:
+            raise
+        except PermissionError as e:
+            raise ToolError(f"Error: Permission denied editing '{file_path}'.") from e
         except Exception as e:
-            return f"Error editing file: {str(e)}"
+            raise ToolError(f"Error editing file: {str(e)}") from e
 
 class ExecuteCommandTool:
     """Tool for executing shell commands"""
@@ -195,235 +458,489 @@ class ExecuteCommandTool:
             "required": ["command"]
         }
     }
+
+    HANDLER = "execute_command"
+    STATUS = "Executing command"
+    READ_ONLY = False
+    CONFIRM = "confirm"
+
+    # Unsafe commands matched as word prefixes in one pass. The leading boundary stops
+    # "harmless" from matching "rm", while "/bin/rm" still matches. No trailing boundary, so
+    # variants like rmdir, rmmod, sudoedit, killall and killall5 stay blocked as they were
+    # under the old substring check; pkill and xkill are listed explicitly.
+    UNSAFE_RE = re.compile(r"\b(?:rm|chmod|chown|sudo|[px]?kill|reboot|shutdown)")
+
+    def __init__(self, cwd: pathlib.Path):
+        self.cwd = cwd
+        # One long-lived shell replaces a fork/exec of /bin/sh per command; started on first use
+        self._shell: Optional[subprocess.Popen] = None
+        self._shell_lock = threading.Lock()
+
+    def _ensure_shell(self) -> subprocess.Popen:
+        """Return the persistent shell, (re)starting it if it is not running"""
+        if self._shell is None or self._shell.poll() is not None:
+            self._shell = subprocess.Popen(
+                ["/bin/bash", "--noprofile", "--norc"],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0,
+            )
+        return self._shell
+
+    def _run_in_shell(self, command: str) -> Tuple[int, str, str]:
+        """Run a command in the persistent shell and return (exit status, stdout, stderr)"""
+        shell = self._ensure_shell()
+        marker = f"__END_{uuid.uuid4().hex}__"
+        # Each command starts from the sandbox root, so a `cd` in an earlier command cannot make
+        # relative paths disagree with the file tools. eval keeps syntax errors from killing the
+        # shell, and /dev/null keeps the command off our control pipe. The marker lines delimit
+        # output and carry the exit status.
+        shell.stdin.write(
+            f"cd {shlex.quote(str(self.cwd))} && eval {shlex.quote(command)} < /dev/null\n"
+            f"printf '\\n{marker}%s\\n' \"$?\"\n"
+            f"printf '\\n{marker}\\n' >&2\n".encode()
+        )
+        out_end = re.compile(rf"\n{marker}(\d+)\n".encode())
+        err_end = f"\n{marker}\n".encode()
+
+        out, err = bytearray(), bytearray()
+        with selectors.DefaultSelector() as selector:
+            selector.register(shell.stdout, selectors.EVENT_READ, out)
+            selector.register(shell.stderr, selectors.EVENT_READ, err)
+            while selector.get_map():
+                for key, _ in selector.select():
+                    chunk = os.read(key.fd, 65536)
+                    # EOF means the command exited the shell; it is restarted on the next call
+                    if not chunk:
+                        selector.unregister(key.fileobj)
+                        continue
+                    key.data.extend(chunk)
+                    done = out_end.search(out) if key.data is out else err_end in err
+                    if done:
+                        selector.unregister(key.fileobj)
+
+        match = out_end.search(out)
+        if match:
+            status, out = int(match.group(1)), out[:match.start()]
+        else:
+            status = shell.wait()
+        err_idx = err.find(err_end)
+        if err_idx != -1:
+            err = err[:err_idx]
+        return status, out.decode('utf-8', 'replace'), err.decode('utf-8', 'replace')
+
+    def close(self) -> None:
+        """Stop the persistent shell"""
+        if self._shell is not None and self._shell.poll() is None:
+            self._shell.stdin.close()
+            self._shell.terminate()
+            self._shell.wait()
     
-    @staticmethod
-    def execute_command(command: str) -> str:
-        """Execute a shell command and return the output"""
-        
+    def _check_command(self, command: str) -> None:
+        """Reject unsafe commands"""
+        if self.UNSAFE_RE.search(command):
+            raise ToolError("Error: Unsafe command detected. Command execution is restricted.")
+
+    async def confirm(self, command: str) -> Optional[str]:
+        """Ask the user to approve a command. Returns the result to report instead of running it, or None to run it"""
         # Don't allow unsafe commands
-        unsafe_commands = ["rm", "chmod", "chown", "sudo", "kill", "reboot", "shutdown"]
+        self._check_command(command)
 
-        if any(cmd in command for cmd in unsafe_commands):
-            return "Error: Unsafe command detected. Command execution is restricted."
+        # Ask user for confirmation on the event loop, so Ctrl-C here cancels the call before it runs
+        confirmation = await _ainput(f"{Colors.SYSTEM}Are you sure you want to execute this command\n{command}? (yes/no): {Colors.RESET}")
+        if confirmation.lower() != "yes":
+            return "Command execution cancelled by user."
+        return None
+    
+    def execute_command(self, command: str) -> str:
+        """Execute a shell command and return the output"""
+        # Checked again so the handler never runs an unsafe command, confirmed or not
+        self._check_command(command)
 
         try:
-            # Ask user for confirmation
-            confirmation = input(f"{Colors.SYSTEM}Are you sure you want to execute this command\n{command}? (yes/no): {Colors.RESET}")
-            if confirmation.lower() != "yes":
-                return "Command execution cancelled by user."
-
-            result = subprocess.run(command, shell=True, capture_output=True, text=True)
-            if result.stdout:
-                print(f"{Colors.TOOL}Command output:{Colors.RESET} {result.stdout.strip()}")
-            if result.returncode != 0:
-                return f"Error executing command: {result.stderr.strip()}"
-            return result.stdout.strip()
+            # Commands share one shell, so only one may run at a time
+            with self._shell_lock:
+                returncode, stdout, stderr = self._run_in_shell(command)
+            if stdout:
+                _out(f"{Colors.TOOL}Command output:{Colors.RESET} {stdout.strip()}\n")
+            if returncode != 0:
+                raise ToolError(f"Error executing command: {stderr.strip()}")
+            return stdout.strip()
+        except ToolError:
+            raise
         except Exception as e:
-            return f"Error executing command: {str(e)}"
+            raise ToolError(f"Error executing command: {str(e)}") from e
 
 class ConvertChemicalNameToCartesianTool:
     """Tool for converting SMILES strings to Cartesian coordinates"""
     
     SCHEMA = {
         "name": "convert_chemical_name_to_cartesian_tool",
-        "description": "Converts chemical name of a compound to Cartesian coordinates",
+        "description": "Converts chemical name of a compound to Cartesian coordinates. Pass several compounds at once with 'names'.",
         "input_schema": {
             "type": "object",
             "properties": {
                 "name": {
                     "type": "string",
                     "description": "The chemical name of the compound to convert to Cartesian coordinates"
+                },
+                "names": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Chemical names of several compounds to convert in one call"
                 }
             },
-            "required": ["name"]
+            "required": []
         }
     }
-    
+
+    HANDLER = "convert"
+    STATUS = "Converting chemical name to Cartesian coordinates"
+    READ_ONLY = False
+    CONFIRM = None
+
     @staticmethod
-    def convert(name: str) -> str:
-        """Convert a chemical name to Cartesian coordinates"""
+    def _convert_one(name: str) -> str:
+        """Resolve a chemical name to SMILES and embed it in 3D"""
         smiles = urlopen(f"http://cactus.nci.nih.gov/chemical/structure/{quote(name)}/smiles").read().decode('utf8')
         mol = Chem.MolFromSmiles(smiles)
+        if mol is None:
+            raise ToolError(f"Error: Could not parse SMILES '{smiles}' for '{name}'.")
         mol = Chem.AddHs(mol)
-        AllChem.EmbedMolecule(mol)
-        result = Chem.MolToXYZBlock(mol)
-        return result
+        # ETKDGv3 is faster and more robust than the legacy embedder
+        if AllChem.EmbedMolecule(mol, AllChem.ETKDGv3()) == -1:
+            raise ToolError(f"Error: Could not embed '{name}' in 3D.")
+        return Chem.MolToXYZBlock(mol)
+
+    def convert_batch(self, names: List[str]) -> str:
+        """Convert several chemical names concurrently"""
+        def convert_or_error(name: str) -> str:
+            try:
+                return self._convert_one(name)
+            except ToolError as e:
+                return str(e)
+            except Exception as e:
+                return f"Error: {str(e)}"
+
+        # Name lookups are network-bound and RDKit releases the GIL while embedding,
+        # so threads overlap both across molecules
+        with ThreadPoolExecutor(max_workers=min(len(names), os.cpu_count() or 1)) as pool:
+            results = list(pool.map(convert_or_error, names))
+        return "\n".join(f"{name}:\n{result}" for name, result in zip(names, results))
+    
+    def convert(self, name: Optional[str] = None, names: Optional[List[str]] = None) -> str:
+        """Convert a chemical name (or a list of them) to Cartesian coordinates"""
+        if names:
+            return self.convert_batch(names)
+        if not name:
+            raise ToolError("Error: Provide 'name' or 'names'.")
+        return self._convert_one(name)
         
 
+# Schemas for every tool, built once at import. The order is fixed so the tools
+# payload stays byte-identical across requests whatever the activation order.
+TOOLS = [
+    FileReaderTool.SCHEMA,
+    ListFilesTool.SCHEMA,
+    EditFileTool.SCHEMA,
+    ExecuteCommandTool.SCHEMA,
+    ConvertChemicalNameToCartesianTool.SCHEMA,
+]
+
+def _tool_result(tool_use_id: str, content: str, is_error: bool = False) -> Dict[str, Any]:
+    """Build a tool_result content block"""
+    if is_error:
+        return {"type": "tool_result", "tool_use_id": tool_use_id, "content": content, "is_error": True}
+    return {"type": "tool_result", "tool_use_id": tool_use_id, "content": content}
+
 class TerminalChat:
     """Main chat application class"""
+
+    # Tool results from turns older than this many user turns are replaced with a short summary
+    HISTORY_WINDOW_TURNS = 3
+
+    # Pause for a user correction when every tool call in a batch fails. Off by default, since
+    # Claude recovers from routine failures like a missing file on its own via is_error results
+    PROMPT_ON_TOOL_FAILURE = False
+
+    # Constant terminal strings, built once rather than on every turn or tool dispatch
+    _PROMPT_YOU = f"{Colors.USER}You:{Colors.RESET} "
+    _TOOL_FMT = f"{Colors.TOOL}{{}}: {{}}{Colors.RESET}\n"
     
     def __init__(self):
-        self.client = anthropic.Anthropic()
+        self.client = anthropic.AsyncAnthropic(http_client=HTTP_CLIENT)
+        # Resolve the sandbox root once instead of calling os.getcwd() on every tool call
+        self._cwd = pathlib.Path.cwd().resolve()
         self.messages: List[Dict[str, Any]] = []
         self.tool_map = {
             "read_file_tool": (FileReaderTool(), FileReaderTool.SCHEMA),
-            "list_files_tool": (ListFilesTool(), ListFilesTool.SCHEMA),
-            "edit_file_tool": (EditFileTool(), EditFileTool.SCHEMA),
-            "execute_command_tool": (ExecuteCommandTool(), ExecuteCommandTool.SCHEMA),
+            "list_files_tool": (ListFilesTool(self._cwd), ListFilesTool.SCHEMA),
+            "edit_file_tool": (EditFileTool(self._cwd), EditFileTool.SCHEMA),
+            "execute_command_tool": (ExecuteCommandTool(self._cwd), ExecuteCommandTool.SCHEMA),
             "convert_chemical_name_to_cartesian_tool": (ConvertChemicalNameToCartesianTool(), ConvertChemicalNameToCartesianTool.SCHEMA)
         }
+        # Dispatch table: tool name -> (bound handler, accepted input keys, status label, bound
+        # confirmation or None), derived from each tool's class attributes so adding a tool is
+        # one tool_map entry
+        self._tool_handlers = {
+            name: (getattr(tool, tool.HANDLER), tuple(schema["input_schema"]["properties"]), tool.STATUS,
+                   getattr(tool, tool.CONFIRM) if tool.CONFIRM else None)
+            for name, (tool, schema) in self.tool_map.items()
+        }
+        # Tools safe to start mid-stream, before the final stop_reason is known
+        self._early_tools = frozenset(name for name, (tool, _) in self.tool_map.items() if tool.READ_ONLY)
         self.active_tools = set()
         self.tools = []
+        self._tools_cache: Dict[frozenset, List[Dict[str, Any]]] = {}
+        # Messages before this index have already been trimmed
+        self._trimmed_upto = 0
+        # Tool calls started mid-stream, keyed by tool_use id
+        self._pending_tools: Dict[str, asyncio.Task] = {}
     
+    def _trim_history(self) -> None:
+        """Elide tool results outside the sliding window so request size stays bounded"""
+        # Find where the last HISTORY_WINDOW_TURNS user turns begin
+        turns = 0
+        cutoff = 0
+        for idx in range(len(self.messages) - 1, self._trimmed_upto - 1, -1):
+            message = self.messages[idx]
+            if message["role"] == "user" and isinstance(message["content"], str):
+                turns += 1
+                if turns == self.HISTORY_WINDOW_TURNS:
+                    cutoff = idx
+                    break
+        if cutoff <= self._trimmed_upto:
+            return
+
+        for message in self.messages[self._trimmed_upto:cutoff]:
+            if message["role"] != "user" or isinstance(message["content"], str):
+                continue
+            for block in message["content"]:
+                if block.get("type") == "tool_result":
+                    block["content"] = f"[elided: {len(str(block['content']))} chars]"
+        self._trimmed_upto = cutoff
+
     def _setup_tools(self) -> List[Dict[str, Any]]:
         """Setup tool definitions for Claude"""
-        return [self.tool_map[name][1] for name in self.active_tools]
+        # Reuse the list built for the same set of active tools
+        key = frozenset(self.active_tools)
+        tools = self._tools_cache.get(key)
+        if tools is None:
+            tools = self._tools_cache[key] = [schema for schema in TOOLS if schema["name"] in key]
+        return tools
     
-    def _handle_tool_use(self, tool_call) -> str:
-        """Handle tool use requests from Claude"""
-        tool_instance = self.tool_map[tool_call.name][0]
-        match tool_call.name:
-            case "read_file_tool":
-                file_path = tool_call.input["file_path"]
-                print(f"{Colors.TOOL}Reading file: {file_path}{Colors.RESET}")
-                
-                # Execute the tool
-                result = tool_instance.read_file(file_path)
-
-            case "list_files_tool":
-                directory_path = tool_call.input["directory_path"] if "directory_path" in tool_call.input else "."
-                print(f"{Colors.TOOL}Listing files in: {directory_path}{Colors.RESET}")
-
-                # Execute the tool
-                result = tool_instance.list_files(directory_path)
-
-            case "edit_file_tool":
-                file_path = tool_call.input["file_path"]
-                old_str = tool_call.input["old_str"]
-                new_str = tool_call.input["new_str"]
-                print(f"{Colors.TOOL}Editing file: {file_path}{Colors.RESET}")
-
-                #Execute the tool
-                result = tool_instance.edit_file(file_path, old_str, new_str)
-
-            case "execute_command_tool":
-                command = tool_call.input["command"]
-                print(f"{Colors.TOOL}Executing command: {command}{Colors.RESET}")
-
-                # Execute the tool
-                result = tool_instance.execute_command(command)
+    async def _dispatch(self, tool_call) -> Dict[str, Any]:
+        """Execute a single tool call in the default thread pool and return its tool_result block"""
+        if tool_call.name not in self._tool_handlers:
+            _out(f"{Colors.ERROR}Unknown tool: {tool_call.name}{Colors.RESET}\n")
+            return _tool_result(tool_call.id, f"Error: Unknown tool '{tool_call.name}'.", is_error=True)
 
-            case "convert_chemical_name_to_cartesian_tool":
-                smiles = tool_call.input["name"]
-                print(f"{Colors.TOOL}Converting chemical name to Cartesian coordinates: {smiles}{Colors.RESET}")
+        handler, params, label, confirm = self._tool_handlers[tool_call.name]
+        args = {param: tool_call.input[param] for param in params if param in tool_call.input}
+        _out(self._TOOL_FMT.format(label, next(iter(args.values()), '.')))
 
-                # Execute the tool
-                result = tool_instance.convert(smiles)
-
-            case _:
-                print(f"{Colors.ERROR}Unknown tool: {tool_call.name}{Colors.RESET}")
+        # Execute the tool; failures become error tool_results instead of crashing the chat
+        try:
+            # Confirm on the event loop rather than in the worker, so Ctrl-C at the prompt
+            # cancels the call instead of leaving a thread to run it after the next line typed
+            if confirm is not None and (refusal := await confirm(**args)) is not None:
+                return _tool_result(tool_call.id, refusal)
+            return _tool_result(tool_call.id, await asyncio.to_thread(handler, **args))
+        except ToolError as e:
+            return _tool_result(tool_call.id, str(e), is_error=True)
+        except Exception as e:
+            return _tool_result(tool_call.id, f"Error running {tool_call.name}: {str(e)}", is_error=True)
+
+    async def _drain_pending_tools(self) -> None:
+        """Wait for tool calls started mid-stream that the final response did not go on to request"""
+        if not self._pending_tools:
+            return
+        # Await rather than drop them, so no tool thread outlives its turn unobserved
+        results = await asyncio.gather(*self._pending_tools.values())
+        self._pending_tools.clear()
+        for result in results:
+            if result.get("is_error"):
+                print(f"{Colors.ERROR}{result['content']}{Colors.RESET}")
+        print(f"{Colors.SYSTEM}Discarded {len(results)} tool result(s) started before the response was final.{Colors.RESET}")
+
+    async def _handle_tool_use(self, tool_calls) -> None:
+        """Handle tool use requests from Claude"""
+        # Read-only calls run concurrently in worker threads; some already started while the
+        # response streamed. Calls with side effects run one at a time in the order Claude sent
+        # them, after the reads before them and before the reads after them, so two edits to
+        # one file cannot overwrite each other and a read sees every earlier edit.
+        results = []
+        reads = []
+        for tool_call in tool_calls:
+            task = self._pending_tools.pop(tool_call.id, None)
+            if task is not None or tool_call.name in self._early_tools:
+                reads.append(task or self._dispatch(tool_call))
+                continue
+            results.extend(await asyncio.gather(*reads))
+            reads.clear()
+            results.append(await self._dispatch(tool_call))
+        results.extend(await asyncio.gather(*reads))
+        await self._drain_pending_tools()
+
+        # Optionally, when every call failed, let the user correct course before the follow-up
+        # request instead of spending a round-trip on Claude asking for the same correction
+        if self.PROMPT_ON_TOOL_FAILURE and all(result.get("is_error") for result in results):
+            for result in results:
+                print(f"{Colors.ERROR}{result['content']}{Colors.RESET}")
+            correction = await _ainput(
+                f"{Colors.SYSTEM}All tool calls failed. Add a correction for Claude (Enter to skip): {Colors.RESET}"
+            )
+            if correction.strip():
+                results.append({"type": "text", "text": correction})
 
-        # Add tool call and result to messages
+        # Add tool calls and results to messages
         self.messages.append({
             "role": "assistant",
-            "content": [tool_call]
+            "content": tool_calls
         })
-        # Ensure result is a dict for Anthropic tool_result
+        # Return every tool_result in a single user message so the batch costs one round-trip
         self.messages.append({
             "role": "user",
-            "content": [
-                {
-                    "type": "tool_result",
-                    "tool_use_id": tool_call.id,
-                    "content": result
-                }
-            ]
+            "content": results
         })
     
-    def _process_claude_response(self, user_input, response, evaluate=False) -> bool:
+    async def _process_claude_response(self, user_input, response, evaluate=False) -> bool:
         """Process Claude's response and handle tool use. Returns True if conversation should continue."""
         if response.stop_reason == "tool_use":
-            # Extract text content and tool calls
-            tool_call = None
-            text_content = ""
-            
-            for content in response.content:
-                if content.type == "text":
-                    text_content += content.text
-                elif content.type == "tool_use":
-                    tool_call = content
-            
-            # Display any text response first
-            if text_content.strip():
-                print(f"{Colors.CLAUDE}Claude:{Colors.RESET} {text_content}")
+            # Extract tool calls; any text was already streamed to the terminal
+            tool_calls = [content for content in response.content if content.type == "tool_use"]
             
             # Handle the tool use
-            if tool_call:
-                self._handle_tool_use(tool_call)
+            if tool_calls:
+                await self._handle_tool_use(tool_calls)
                 return True  # Continue conversation to get Claude's response to tool result
         else:
             # Handle regular text response
+            await self._drain_pending_tools()
             ai_message = ""
             for content in response.content:
                 if content.type == "text":
                     ai_message += content.text
 
             if evaluate:
-                evaluation = self._evaluate_agent_answer(user_input, ai_message)
+                evaluation = await self._evaluate_agent_answer(user_input, ai_message)
                 for content in evaluation.content:
                     if content.type == "text":
-                        ai_message += f"\n\n{Colors.SYSTEM}Evaluation:{Colors.RESET} {content.text}"
+                        evaluation_text = f"\n\n{Colors.SYSTEM}Evaluation:{Colors.RESET} {content.text}"
+                        print(evaluation_text)
+                        ai_message += evaluation_text
 
-            print(f"{Colors.CLAUDE}Claude:{Colors.RESET} {ai_message}")
             self.messages.append({"role": "assistant", "content": ai_message})
         
         return False  # End this response cycle
     
-    def _get_user_input(self) -> Optional[str]:
-        SYSTEM_PROMPT = f"""You are a helpful AI assistant. You have access to the following tools: {self.active_tools}. Use the tools when necessary to assist the user.
+    def _system_prompt(self) -> List[Dict[str, Any]]:
+        """Build the system prompt, marked as a prompt-cache breakpoint"""
+        # Sorted so the prompt (and therefore the cached prefix) is stable across turns
+        system_prompt = f"""You are a helpful AI assistant. You have access to the following tools: {sorted(self.active_tools)}. Use the tools when necessary to assist the user.
                         If you anticipate needing a tool, create a plan in advance.
                         You can also use your knowledge to answer questions directly.
                         """
+        # Caches the tool schemas and the system prompt, which precede it in the prompt
+        return [{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}]
+
+    def _cached_messages(self) -> List[Dict[str, Any]]:
+        """Return the history with a prompt-cache breakpoint on its final content block"""
+        last = self.messages[-1]
+        content = last["content"]
+        if isinstance(content, str):
+            content = [{"type": "text", "text": content}]
+        if not content or not isinstance(content[-1], dict):
+            return self.messages
+        # Copy rather than mutate, so only the newest message ever carries the breakpoint
+        content = content[:-1] + [{**content[-1], "cache_control": {"type": "ephemeral"}}]
+        return self.messages[:-1] + [{**last, "content": content}]
+
+    async def _get_user_input(self) -> Optional[str]:
         """Get user input and check for exit commands"""
-        user_input = input(f"{Colors.USER}You:{Colors.RESET} ")
-        if user_input.lower() in ["exit", "quit"]:
-            print(f"{Colors.SYSTEM}Exiting chat.{Colors.RESET}")
-            return None
-        if user_input.startswith("/activate "):
-            tool_name = user_input.split(" ", 1)[1].strip()
-            if tool_name in self.tool_map:
-                self.active_tools.add(tool_name)
-                self.tools = self._setup_tools()
-                print(f"{Colors.SYSTEM}Activated {tool_name}.{Colors.RESET}")
-            else:
-                print(f"{Colors.ERROR}Unknown tool: {tool_name}{Colors.RESET}")
-            return self._get_user_input()
-        if user_input.startswith("/deactivate "):
-            tool_name = user_input.split(" ", 1)[1].strip()
-            if tool_name in self.active_tools:
-                self.active_tools.remove(tool_name)
-                self.tools = self._setup_tools()
-                print(f"{Colors.SYSTEM}Deactivated {tool_name}.{Colors.RESET}")
-            else:
-                print(f"{Colors.ERROR}Tool not active: {tool_name}{Colors.RESET}")
-            return self._get_user_input()
-        final_input = f"{SYSTEM_PROMPT}\n{user_input}"
-        return final_input
+        # Loop over meta-commands instead of recursing, so any number of them is fine
+        while True:
+            user_input = await _ainput(self._PROMPT_YOU)
+            if user_input.lower() in ["exit", "quit"]:
+                print(f"{Colors.SYSTEM}Exiting chat.{Colors.RESET}")
+                return None
+            if user_input.startswith("/activate "):
+                tool_name = user_input.split(" ", 1)[1].strip()
+                if tool_name in self.tool_map:
+                    self.active_tools.add(tool_name)
+                    self.tools = self._setup_tools()
+                    print(f"{Colors.SYSTEM}Activated {tool_name}.{Colors.RESET}")
+                else:
+                    print(f"{Colors.ERROR}Unknown tool: {tool_name}{Colors.RESET}")
+                continue
+            if user_input.startswith("/deactivate "):
+                tool_name = user_input.split(" ", 1)[1].strip()
+                if tool_name in self.active_tools:
+                    self.active_tools.remove(tool_name)
+                    self.tools = self._setup_tools()
+                    print(f"{Colors.SYSTEM}Deactivated {tool_name}.{Colors.RESET}")
+                else:
+                    print(f"{Colors.ERROR}Tool not active: {tool_name}{Colors.RESET}")
+                continue
+            return user_input
     
-    def _send_message_to_claude(self):
-        """Send current messages to Claude and process response"""
+    async def _send_message_to_claude(self):
+        """Stream Claude's reply to the terminal and return the final message"""
         try:
-            response = self.client.messages.create(
-                model="claude-3-5-haiku-latest",
-                messages=self.messages,
+            async with self.client.messages.stream(
+                model=MODEL_HAIKU,
+                system=self._system_prompt(),
+                messages=self._cached_messages(),
                 tools=self.tools,
                 max_tokens=1000,
-            )
-            return response
+            ) as stream:
+                # Print text deltas as they arrive, batching them to amortize write and render cost.
+                # Tokens bypass sys.stdout and go straight to the fd, so drain its buffer first.
+                sys.stdout.flush()
+                started = False
+                start_early = True
+                pending: List[str] = []
+                pending_chars = 0
+                last_flush = time.monotonic()
+                async for event in stream:
+                    if event.type == "text":
+                        if not started:
+                            _write_stdout(CLAUDE_PREFIX)
+                            started = True
+                        pending.append(event.text)
+                        pending_chars += len(event.text)
+                    elif event.type == "content_block_stop" and event.content_block.type == "tool_use":
+                        # Start a read-only tool as soon as its input is complete, overlapping it with the rest
+                        # of the stream. Others wait for stop_reason == "tool_use": a truncated turn may carry
+                        # input rebuilt from partial JSON, and a confirmation prompt would fight the stream.
+                        block = event.content_block
+                        if block.name not in self._early_tools:
+                            # Reads after this call must see its effects, so none of them start early
+                            start_early = False
+                        elif start_early:
+                            self._pending_tools[block.id] = asyncio.create_task(self._dispatch(block))
+                    now = time.monotonic()
+                    if pending and (pending_chars >= STREAM_FLUSH_CHARS or now - last_flush >= STREAM_FLUSH_SECONDS):
+                        _write_stdout("".join(pending).encode('utf-8'))
+                        pending.clear()
+                        pending_chars = 0
+                        last_flush = now
+                if started:
+                    pending.append("\n")
+                _write_stdout("".join(pending).encode('utf-8'))
+                return await stream.get_final_message()
         except Exception as e:
             print(f"{Colors.ERROR}Error communicating with Claude: {str(e)}{Colors.RESET}")
+            await self._drain_pending_tools()
             return None
     
     def _display_welcome_message(self):
         """Display welcome message"""
         print(f"{Colors.SYSTEM}Welcome to Python AI AGENT! Type 'exit' or 'quit' to stop.{Colors.RESET}")
 
-    def _select_tools_cli(self):
+    async def _select_tools_cli(self):
         print(f"{Colors.SYSTEM}Select which tools to activate. Type the numbers separated by commas (e.g., 1,3,5):{Colors.RESET}")
         for idx, name in enumerate(self.tool_map.keys(), 1):
             print(f"{Colors.TOOL}{idx}. {name}{Colors.RESET}")
-        selection = input("Activate tools: ")
+        selection = await _ainput("Activate tools: ")
         try:
             indices = [int(i.strip()) for i in selection.split(",") if i.strip().isdigit()]
             for idx in indices:
@@ -433,7 +950,7 @@ class TerminalChat:
             print(f"{Colors.ERROR}Invalid selection. All tools will be activated by default.{Colors.RESET}")
             self.active_tools = set(self.tool_map.keys())
 
-    def _evaluate_agent_answer(self, user_input: str, response: str):
+    async def _evaluate_agent_answer(self, user_input: str, response: str):
         """Evaluate the agent's answer and return a response"""
         prompt = f"""Evaluate the answer provided by the agent based on the user's input.
                     User Input: {user_input}
@@ -447,8 +964,8 @@ class TerminalChat:
 
         try:
             self.messages.append({"role": "user", "content": prompt})
-            evaluation_response = self.client.messages.create(
-                model="claude-3-5-haiku-latest",
+            evaluation_response = await self.client.messages.create(
+                model=MODEL_HAIKU,
                 messages=self.messages,
                 max_tokens=1000,
             )
@@ -456,36 +973,44 @@ class TerminalChat:
         except Exception as e:
             print(f"{Colors.ERROR}Error communicating with Claude: {str(e)}{Colors.RESET}")
 
-    def run(self):
+    async def run(self):
         """Main chat loop"""
         self._display_welcome_message()
-        self._select_tools_cli()
+        await self._select_tools_cli()
         self.tools = self._setup_tools()
         
-        while True:
-            # Get user input
-            user_input = self._get_user_input()
-            if user_input is None:
-                break
-            
-            # Add user message
-            self.messages.append({"role": "user", "content": user_input})
-            
-            # Process Claude's response(s)
+        try:
             while True:
-                response = self._send_message_to_claude()
-                if response is None:
+                # Get user input
+                user_input = await self._get_user_input()
+                if user_input is None:
                     break
+            
+                # Add user message
+                self.messages.append({"role": "user", "content": user_input})
+            
+                # Process Claude's response(s)
+                while True:
+                    response = await self._send_message_to_claude()
+                    if response is None:
+                        break
                 
-                # Process the response and check if we need to continue
-                should_continue = self._process_claude_response(user_input, response, evaluate=False)
-                if not should_continue:
-                    break
+                    # Process the response and check if we need to continue
+                    should_continue = await self._process_claude_response(user_input, response, evaluate=False)
+                    if not should_continue:
+                        break
+
+                self._trim_history()
+        finally:
+            self.tool_map["execute_command_tool"][0].close()
 
-def main():
+async def main():
     """Entry point for the application"""
     chat = TerminalChat()
-    chat.run()
+    await chat.run()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print(f"\n{Colors.SYSTEM}Exiting chat.{Colors.RESET}")
\ No newline at end of file